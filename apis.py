@@ -1,17 +1,106 @@
+import logging
 import math
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, ResponseError
+from urllib3.util.retry import Retry
 
+_log = logging.getLogger(__name__)
 
-def fetch_osm_context(lat: float, lon: float) -> Dict:
+# Attente max (s) acceptée sur un Retry-After : les appels tournent dans le
+# thread du script Streamlit, un 429 ne doit pas figer la page.
+_MAX_RETRY_AFTER = 2.0
+
+
+class _CappedRetry(Retry):
     """
-    Récupère quelques infos OSM pour affiner les ordres de grandeur :
-    - nombre de niveaux si disponible
-    - dimensions approximatives via la bounding box
-    Si OSM ne répond pas, on retourne des valeurs par défaut.
+    Retry qui respecte l'en-tête Retry-After quand l'attente demandée reste
+    sous _MAX_RETRY_AFTER. Au-delà, on abandonne sans renvoyer la requête :
+    l'appelant retombe sur ses valeurs par défaut (non mises en cache).
+    """
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if response is not None:
+            retry_after = self.get_retry_after(response)
+            host = getattr(_pool, "host", "")
+            if response.status == 429:
+                _log.warning("Limitation de débit (429) sur %s%s, Retry-After=%s", host, url, retry_after)
+            if retry_after is not None and retry_after > _MAX_RETRY_AFTER:
+                raise MaxRetryError(
+                    _pool, url, ResponseError(f"Retry-After de {retry_after:.0f} s, requête abandonnée")
+                )
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+
+def _build_session() -> requests.Session:
+    """
+    Session HTTP partagée par tous les appels externes (Nominatim, Google).
+    - keep-alive : on réutilise les connexions TCP/TLS d'un appel à l'autre
+    - quelques retries sur les erreurs transitoires (429 / 5xx), en
+      respectant l'en-tête Retry-After (abandon s'il dépasse _MAX_RETRY_AFTER)
+    - pas de retry sur timeout de lecture, un seul sur échec de connexion :
+      un serveur bloqué coûte au plus ~HTTP_TIMEOUT, pas trois fois
     """
-    ctx: Dict = {
+    session = requests.Session()
+    retry = _CappedRetry(
+        total=2,
+        connect=1,
+        read=0,
+        backoff_factor=0.5,
+        status_forcelist=[429, 502, 503, 504],
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=retry)
+    session.mount("https://", adapter)
+    session.headers.update(
+        {
+            "User-Agent": "LibertFacadeEstimator/1.0 (contact@libertsas.fr)",
+            "Accept-Encoding": "gzip, deflate",
+        }
+    )
+    return session
+
+
+SESSION = _build_session()
+
+# (connexion, lecture) : on borne la latence pour ne pas bloquer le rendu Streamlit
+HTTP_TIMEOUT = (3.05, 5)
+
+# Approximations mètres/° (suffisant pour un estimateur)
+_M_PER_DEG_LAT = 111_132.0
+_M_PER_DEG_LON_EQUATOR = 111_320.0
+
+
+def _bbox_size_m(bbox: List) -> Tuple[float, float]:
+    """
+    Dimensions (largeur est-ouest, hauteur nord-sud) en mètres d'une
+    bounding box Nominatim [south, north, west, east].
+    """
+    south, north, west, east = map(float, bbox)
+    lat_mid = (south + north) / 2.0
+    lon_m = _M_PER_DEG_LON_EQUATOR * max(0.1, abs(math.cos(math.radians(lat_mid))))
+    return abs(east - west) * lon_m, abs(north - south) * _M_PER_DEG_LAT
+
+
+_NOMINATIM_REVERSE_URL = "https://nominatim.openstreetmap.org/reverse"
+# Paramètres fixes ; seules lat/lon (arrondies à ~1 m) varient d'un appel à l'autre
+_NOMINATIM_REVERSE_PARAMS = {
+    "format": "jsonv2",
+    "zoom": "18",
+    "polygon_geojson": "0",
+    "addressdetails": "1",
+    "extratags": "1",
+}
+
+
+def default_osm_context() -> Dict:
+    """
+    Valeurs par défaut quand OSM ne donne rien d'exploitable.
+    """
+    return {
         "levels": 5,
         "front_length_m": 15.0,
         "depth_m": 12.0,
@@ -20,63 +109,47 @@ def fetch_osm_context(lat: float, lon: float) -> Dict:
         "facade_cour_m": None,
     }
 
-    try:
-        url = "https://nominatim.openstreetmap.org/reverse"
-        params = {
-            "format": "jsonv2",
-            "lat": str(lat),
-            "lon": str(lon),
-            "zoom": "18",
-            "polygon_geojson": "0",
-            "addressdetails": "1",
-            "extratags": "1",
-        }
-        headers = {
-            "User-Agent": "LibertFacadeEstimator/1.0 (contact@libertsas.fr)"
-        }
-        resp = requests.get(url, params=params, headers=headers, timeout=5)
-        data = resp.json()
-
-        # Niveaux
-        extratags = data.get("extratags", {}) or {}
-        levels = extratags.get("building:levels")
-        if levels:
-            try:
-                ctx["levels"] = max(1, min(int(levels), 15))
-            except Exception:
-                pass
-
-        # Bounding box -> front_length / depth approximatifs
-        bbox = data.get("boundingbox")
-        if bbox and len(bbox) == 4:
-            south, north, west, east = map(float, bbox)
-            lat_mid = (south + north) / 2.0
-
-            # Approximations mètres/° (suffisant pour un estimateur)
-            lat_m = 111_132.0
-            lon_m = 111_320.0 * max(
-                0.1, abs(math.cos(lat_mid * math.pi / 180.0))
-            )
-
-            height_m = abs(north - south) * lat_m
-            width_m = abs(east - west) * lon_m
-
-            front = max(width_m, 5.0)
-            depth = max(height_m, 5.0)
-
-            # On suppose la façade la plus longue côté rue
-            ctx["front_length_m"] = float(front)
-            ctx["depth_m"] = float(depth)
-
-        # Heuristique rapide Haussmann (juste pour info, pas vital au pricing)
-        address = data.get("address", {}) or {}
-        city = (address.get("city") or address.get("town") or "").lower()
-        if "paris" in city and ctx["levels"] >= 5:
-            ctx["is_haussmann_suspected"] = True
-
-    except Exception:
-        # On garde les valeurs par défaut
-        pass
+
+def fetch_osm_context_strict(lat: float, lon: float) -> Dict:
+    """
+    Récupère quelques infos OSM pour affiner les ordres de grandeur :
+    - nombre de niveaux si disponible
+    - dimensions approximatives via la bounding box
+    Les erreurs (réseau, 429, réponse illisible...) remontent à l'appelant :
+    seule une vraie réponse d'OSM peut être mise en cache.
+    """
+    ctx = default_osm_context()
+
+    params = dict(_NOMINATIM_REVERSE_PARAMS, lat=f"{lat:.5f}", lon=f"{lon:.5f}")
+    resp = SESSION.get(_NOMINATIM_REVERSE_URL, params=params, timeout=HTTP_TIMEOUT)
+    resp.raise_for_status()
+    data = resp.json()
+
+    # Niveaux
+    extratags = data.get("extratags", {}) or {}
+    levels = extratags.get("building:levels")
+    if levels:
+        try:
+            ctx["levels"] = max(1, min(int(levels), 15))
+        except Exception:
+            pass
+
+    # Bounding box -> front_length / depth approximatifs
+    bbox = data.get("boundingbox")
+    if bbox and len(bbox) == 4:
+        width_m, height_m = _bbox_size_m(bbox)
+        front = max(width_m, 5.0)
+        depth = max(height_m, 5.0)
+
+        # On suppose la façade la plus longue côté rue
+        ctx["front_length_m"] = float(front)
+        ctx["depth_m"] = float(depth)
+
+    # Heuristique rapide Haussmann (juste pour info, pas vital au pricing)
+    address = data.get("address", {}) or {}
+    city = (address.get("city") or address.get("town") or "").lower()
+    if "paris" in city and ctx["levels"] >= 5:
+        ctx["is_haussmann_suspected"] = True
 
     return ctx
 
@@ -93,9 +166,9 @@ def build_streetview_embed_url(lat: float, lon: float, api_key: Optional[str]) -
     if not api_key:
         return ""
 
-    return (
-        "https://www.google.com/maps/embed/v1/streetview"
-        f"?key={api_key}"
-        f"&location={lat:.6f},{lon:.6f}"
-        "&fov=80"
-    )
+    query = {
+        "key": api_key,
+        "location": f"{lat:.6f},{lon:.6f}",
+        "fov": 80,
+    }
+    return f"https://www.google.com/maps/embed/v1/streetview?{urlencode(query, safe=',')}"
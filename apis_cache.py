@@ -0,0 +1,59 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Optional
+
+
+# Cache disque des réponses d'API (géocodage, OSM) : survit aux redémarrages
+# du process, contrairement à st.cache_data. Valeurs stockées en JSON.
+_DB_PATH = os.path.join(os.path.expanduser("~"), ".libertv2", "apis_cache.sqlite3")
+
+# 30 jours : durée maximale de conservation tolérée pour le géocodage Google
+DEFAULT_TTL = 30 * 86400
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+
+
+def _connect() -> sqlite3.Connection:
+    # À appeler sous _lock
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(_DB_PATH), exist_ok=True)
+        conn = sqlite3.connect(_DB_PATH, check_same_thread=False)
+        conn.execute("CREATE TABLE IF NOT EXISTS cache (k TEXT PRIMARY KEY, v TEXT, ts INTEGER)")
+        _conn = conn
+    return _conn
+
+
+def get_or_set(key: str, producer: Callable[[], Any], ttl: int = DEFAULT_TTL) -> Any:
+    """
+    Renvoie la valeur en cache pour `key` si elle a moins de `ttl` secondes,
+    sinon appelle `producer()` et enregistre le résultat.
+    - les exceptions de producer() remontent et ne sont pas mises en cache
+    - si le fichier de cache est inutilisable, on appelle simplement producer()
+    """
+    now = int(time.time())
+    try:
+        with _lock:
+            row = _connect().execute("SELECT v, ts FROM cache WHERE k = ?", (key,)).fetchone()
+        if row is not None and now - row[1] < ttl:
+            return json.loads(row[0])
+    except Exception:
+        pass
+
+    value = producer()
+
+    try:
+        payload = json.dumps(value)
+        with _lock:
+            conn = _connect()
+            conn.execute("INSERT OR REPLACE INTO cache (k, v, ts) VALUES (?, ?, ?)", (key, payload, now))
+            # Purge des entrées expirées à chaque écriture (la table ne grossit pas indéfiniment)
+            conn.execute("DELETE FROM cache WHERE ts < ?", (now - max(ttl, DEFAULT_TTL),))
+            conn.commit()
+    except Exception:
+        pass
+    return value
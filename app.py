@@ -1,11 +1,30 @@
+import hashlib
+import json
+import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+
 import streamlit as st
 import requests
 from typing import Dict, List, Optional, Tuple
 
-from apis import fetch_osm_context, build_streetview_embed_url
-from pricing import Geometry, build_pricing
+try:
+    from fpdf import FPDF
+except ImportError:  # fpdf2 absent : l'application tourne sans PDF
+    FPDF = None
+
+import apis_cache
+from apis import (
+    HTTP_TIMEOUT,
+    SESSION,
+    build_streetview_embed_url,
+    default_osm_context,
+    fetch_osm_context_strict,
+)
+from pricing import EUR_TRANS, FAMILLES_LABELS, Geometry, build_pricing, fmt_eur, group_by_famille
 import ui
-from email_utils import send_estimation_email
 
 
 st.set_page_config(
@@ -16,30 +35,175 @@ st.set_page_config(
 
 ui.init_css()
 
-GOOGLE_API_KEY = st.secrets.get("GOOGLE_API_KEY", None)
+
+def _secret(name: str, default=None):
+    """
+    Lecture tolérante d'un secret Streamlit : sans fichier secrets.toml,
+    st.secrets lève une exception, on retombe alors sur la valeur par défaut.
+    """
+    try:
+        return st.secrets.get(name, default)
+    except Exception:
+        return default
+
+
+GOOGLE_API_KEY = _secret("GOOGLE_API_KEY")
 SMTP_CONF = {
-    "host": st.secrets.get("SMTP_HOST", ""),
-    "port": int(st.secrets.get("SMTP_PORT", 587)),
-    "user": st.secrets.get("SMTP_USER", ""),
-    "password": st.secrets.get("SMTP_PASSWORD", ""),
+    "host": _secret("SMTP_HOST", ""),
+    "port": int(_secret("SMTP_PORT", 587)),
+    "user": _secret("SMTP_USER", ""),
+    "password": _secret("SMTP_PASSWORD", ""),
     "use_tls": True,
 }
+# Envoi possible seulement avec une configuration complète (sinon
+# send_estimation_email sortirait sans rien faire après avoir tout préparé)
+SMTP_ENABLED = bool(SMTP_CONF["host"] and SMTP_CONF["user"] and SMTP_CONF["password"])
 
 
-def init_state() -> None:
-    defaults = {
+_STATE_DEFAULTS = MappingProxyType(
+    {
         "step": 0,
         "addr_label": None,
         "coords": None,
+        "streetview_url": None,
         "osm_ctx": None,
         "building_dims": None,
         "facade_state": None,
         "contact": None,
         "zone_choice": "rue",
+        "mail_future": None,
+        "mail_pending_key": None,
+        "mail_key": None,
     }
-    for k, v in defaults.items():
-        if k not in st.session_state:
-            st.session_state[k] = v
+)
+
+
+def init_state() -> None:
+    fresh = "step" not in st.session_state
+    for k, v in _STATE_DEFAULTS.items():
+        st.session_state.setdefault(k, v)
+    if fresh:
+        load_state()
+        st.session_state["_saved_step"] = st.session_state.step
+
+
+def reset_state() -> None:
+    """
+    Nouvelle estimation : seules les clés de l'application reprennent leur
+    valeur par défaut ; l'état des widgets des étapes non affichées est
+    purgé par Streamlit au rerun suivant. La saisie enregistrée sur disque
+    est supprimée.
+    """
+    st.session_state.update(_STATE_DEFAULTS)
+    sid = st.query_params.get("sid")
+    if sid:
+        try:
+            os.remove(_state_path(sid))
+        except OSError:
+            pass
+
+
+# ----------------------------------------------------------------------
+# Persistance de la saisie (rechargement de page)
+# ----------------------------------------------------------------------
+# Sous-ensemble JSON de la session, un fichier par identifiant ?sid= de l'URL.
+# streetview_url (contient la clé API) est recalculée au chargement ;
+# mail_future n'est pas sérialisable. Les coordonnées du prospect (contact)
+# ne sont jamais écrites sur disque : un rechargement après l'étape 3
+# redemande le formulaire de contact. Les fichiers expirent après _STATE_TTL.
+_STATE_DIR = os.path.join(os.path.expanduser("~"), ".libertv2", "state")
+_STATE_TTL = 86400
+_CONTACT_STEP = 3
+_PERSIST_KEYS = (
+    "step",
+    "addr_label",
+    "coords",
+    "osm_ctx",
+    "building_dims",
+    "facade_state",
+    "zone_choice",
+    "mail_key",
+)
+
+
+def _state_path(sid: str) -> str:
+    digest = hashlib.blake2b(sid.encode("utf-8"), digest_size=16).hexdigest()
+    return os.path.join(_STATE_DIR, f"{digest}.json")
+
+
+def _purge_states(now: float) -> None:
+    # Supprime les saisies abandonnées depuis plus de _STATE_TTL
+    try:
+        entries = list(os.scandir(_STATE_DIR))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if now - entry.stat().st_mtime > _STATE_TTL:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def save_state() -> None:
+    """
+    Enregistre la saisie courante sur disque (appelé à chaque changement
+    d'étape et après l'envoi de l'e-mail). mail_key est conservée : un
+    rechargement à l'étape 4 ne renvoie pas l'e-mail.
+    """
+    state = st.session_state
+    sid = st.query_params.get("sid")
+    if not sid:
+        sid = secrets.token_urlsafe(16)
+        st.query_params["sid"] = sid
+
+    data = {k: state.get(k) for k in _PERSIST_KEYS}
+    try:
+        os.makedirs(_STATE_DIR, exist_ok=True)
+        path = _state_path(sid)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, default=str)
+        os.replace(tmp, path)
+    except Exception:
+        pass
+    _purge_states(time.time())
+
+
+def load_state() -> None:
+    """
+    Restaure la saisie enregistrée pour le ?sid= de l'URL, s'il existe
+    et a moins de _STATE_TTL.
+    """
+    sid = st.query_params.get("sid")
+    if not sid:
+        return
+    path = _state_path(sid)
+    try:
+        if time.time() - os.path.getmtime(path) > _STATE_TTL:
+            os.remove(path)
+            return
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return
+
+    state = st.session_state
+    state.update({k: data[k] for k in _PERSIST_KEYS if k in data})
+    # Le contact n'est pas persisté : retour au formulaire de contact
+    state.step = min(state.step, _CONTACT_STEP)
+    coords = state.get("coords")
+    if coords and GOOGLE_API_KEY:
+        state.streetview_url = build_streetview_embed_url(coords["lat"], coords["lon"], GOOGLE_API_KEY)
+
+
+@st.cache_resource
+def _mail_pool() -> ThreadPoolExecutor:
+    """
+    Pool partagé par toutes les sessions pour l'envoi SMTP en arrière-plan :
+    l'affichage de l'étape 4 n'attend pas le serveur de messagerie.
+    """
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="mail")
 
 
 # ----------------------------------------------------------------------
@@ -49,86 +213,116 @@ def geocode_address(address: str) -> Optional[Dict[str, float]]:
     """
     Geocode l'adresse via l'API Google Geocoding.
     Retourne {"lat": float, "lon": float} ou None si échec.
+    L'adresse est normalisée (casse, espaces) pour mutualiser le cache.
     """
-    addr = (address or "").strip()
+    addr = " ".join((address or "").split()).lower()
     if not addr or not GOOGLE_API_KEY:
         return None
 
     try:
-        url = (
-            "https://maps.googleapis.com/maps/api/geocode/json"
-            f"?address={requests.utils.quote(addr)}&key={GOOGLE_API_KEY}"
-        )
-        resp = requests.get(url, timeout=5)
-        data = resp.json()
-        if data.get("status") == "OK" and data.get("results"):
-            loc = data["results"][0]["geometry"]["location"]
-            return {"lat": float(loc["lat"]), "lon": float(loc["lng"])}
+        return _geocode_cached(addr)
     except Exception:
         return None
 
+
+@st.cache_data(ttl=86400, max_entries=1024, show_spinner=False)
+def _geocode_cached(addr: str) -> Optional[Dict[str, float]]:
+    # Mémoire (st.cache_data) puis disque (apis_cache) avant l'appel Google.
+    # Les erreurs (réseau, quota...) remontent à l'appelant : elles ne sont pas mises en cache.
+    return apis_cache.get_or_set(f"geo:{addr}", lambda: _geocode_remote(addr))
+
+
+def _geocode_remote(addr: str) -> Optional[Dict[str, float]]:
+    url = (
+        "https://maps.googleapis.com/maps/api/geocode/json"
+        f"?address={requests.utils.quote(addr)}&key={GOOGLE_API_KEY}"
+    )
+    resp = SESSION.get(url, timeout=HTTP_TIMEOUT)
+    data = resp.json()
+    status = data.get("status")
+    if status not in ("OK", "ZERO_RESULTS"):
+        raise RuntimeError(f"Geocoding Google indisponible : {status}")
+    if status == "OK" and data.get("results"):
+        loc = data["results"][0]["geometry"]["location"]
+        return {"lat": float(loc["lat"]), "lon": float(loc["lng"])}
     return None
 
 
+@st.cache_data(ttl=86400, max_entries=1024, show_spinner=False)
+def _osm_context_cached(lat: float, lon: float) -> Dict:
+    # Les erreurs OSM remontent : elles ne sont mises en cache ni en mémoire ni sur disque.
+    return apis_cache.get_or_set(f"osm:{lat}:{lon}", lambda: fetch_osm_context_strict(lat, lon))
+
+
+def get_osm_context(lat: float, lon: float) -> Dict:
+    """
+    Contexte OSM mis en cache, clé sur les coordonnées arrondies (~1 m)
+    pour regrouper les géocodages quasi identiques.
+    Si OSM ne répond pas, valeurs par défaut (non mises en cache : le
+    prochain passage retentera l'appel).
+    """
+    try:
+        return _osm_context_cached(round(lat, 5), round(lon, 5))
+    except Exception:
+        return default_osm_context()
+
+
 # ----------------------------------------------------------------------
 # PDF
 # ----------------------------------------------------------------------
+# Caractères hors latin-1 (ou accentués) remplacés avant écriture dans le PDF
+_PDF_TRANS = str.maketrans(
+    {
+        "–": "-",
+        "—": "-",
+        "•": "-",
+        "·": "-",
+        "²": "2",
+        "³": "3",
+        "°": " deg",
+        "€": "EUR",
+        "’": "'",
+        "‘": "'",
+        "“": '"',
+        "”": '"',
+        "«": '"',
+        "»": '"',
+        "…": "...",
+        "é": "e",
+        "è": "e",
+        "ê": "e",
+        "ë": "e",
+        "à": "a",
+        "â": "a",
+        "ù": "u",
+        "û": "u",
+        "î": "i",
+        "ï": "i",
+        "ô": "o",
+        "ö": "o",
+        "ç": "c",
+    }
+)
+
+
 def generate_pdf_estimation(
     addr_label: str,
     geom: Geometry,
-    lignes: List[Dict],
     total_ttc: float,
+    fam_totaux: Dict[str, float],
+    famille_lignes: Dict[str, List[Dict]],
     facade_state: Dict,
     dims: Dict,
     zone_choice: str,
     contact: Dict,
     osm_ctx: Dict,
 ) -> Optional[bytes]:
-    try:
-        from fpdf import FPDF
-    except ImportError:
+    if FPDF is None:
         st.info("Module 'fpdf' non installé : le PDF ne sera pas généré.")
         return None
 
     def safe(text: str) -> str:
-        if text is None:
-            text = ""
-        repl = {
-            "–": "-",
-            "—": "-",
-            "•": "-",
-            "·": "-",
-            "²": "2",
-            "³": "3",
-            "°": " deg",
-            "€": "EUR",
-            "’": "'",
-            "‘": "'",
-            "“": '"',
-            "”": '"',
-            "«": '"',
-            "»": '"',
-            "…": "...",
-            "é": "e",
-            "è": "e",
-            "ê": "e",
-            "ë": "e",
-            "à": "a",
-            "â": "a",
-            "ù": "u",
-            "û": "u",
-            "î": "i",
-            "ï": "i",
-            "ô": "o",
-            "ö": "o",
-            "ç": "c",
-        }
-        for k, v in repl.items():
-            text = text.replace(k, v)
-        return text.encode("latin-1", "replace").decode("latin-1")
-
-    def fmt_eur_ttc(v: float) -> str:
-        return f"{v:,.2f} EUR TTC".replace(",", " ").replace(".", ",")
+        return (text or "").translate(_PDF_TRANS).encode("latin-1", "replace").decode("latin-1")
 
     total_ht = total_ttc / 1.2
 
@@ -147,23 +341,24 @@ def generate_pdf_estimation(
     delai_mois = contact.get("delai_mois")
     urgent_txt = "Oui" if contact.get("urgent") else "Non"
 
-    pdf.multi_cell(190, 6, safe(f"Adresse du chantier : {addr_label}"))
+    # Blocs à format fixe : une ligne par élément, un seul multi_cell par bloc
+    contact_lines = [f"Adresse du chantier : {addr_label}"]
     if nom:
-        pdf.multi_cell(190, 6, safe(f"Contact : {nom}"))
+        contact_lines.append(f"Contact : {nom}")
     if email:
-        pdf.multi_cell(190, 6, safe(f"E-mail : {email}"))
+        contact_lines.append(f"E-mail : {email}")
     if tel:
-        pdf.multi_cell(190, 6, safe(f"Téléphone : {tel}"))
-    pdf.multi_cell(190, 6, safe(f"Délai souhaité avant travaux : {delai_mois} mois (Urgent : {urgent_txt})"))
+        contact_lines.append(f"Téléphone : {tel}")
+    contact_lines.append(f"Délai souhaité avant travaux : {delai_mois} mois (Urgent : {urgent_txt})")
+    pdf.multi_cell(190, 6, safe("\n".join(contact_lines)))
 
     pdf.ln(3)
-    pdf.multi_cell(
-        190,
-        6,
-        safe(f"Zone estimée : {zone_choice.replace('+', ' + ')}"),
-    )
-    pdf.multi_cell(190, 6, safe(f"Surface estimée de façades : {geom.surface_facades:.1f} m2"))
-    pdf.multi_cell(190, 6, safe(f"Hauteur estimée : {geom.hauteur:.1f} m"))
+    geom_lines = [
+        f"Zone estimée : {zone_choice.replace('+', ' + ')}",
+        f"Surface estimée de façades : {geom.surface_facades:.1f} m2",
+        f"Hauteur estimée : {geom.hauteur:.1f} m",
+    ]
+    pdf.multi_cell(190, 6, safe("\n".join(geom_lines)))
 
     etat_facade = facade_state.get("etat_facade", "moyen")
     support_key = facade_state.get("support_key", "").replace("_", " ").title()
@@ -171,18 +366,21 @@ def generate_pdf_estimation(
     sol_txt = "Façade peinte" if sol == "PEINTURE" else "Enduit complet sans peinture"
 
     pdf.ln(3)
-    pdf.multi_cell(190, 6, safe(f"État de façade renseigné : {etat_facade}"))
-    pdf.multi_cell(190, 6, safe(f"Support principal : {support_key}"))
-    pdf.multi_cell(190, 6, safe(f"Solution de ravalement : {sol_txt}"))
+    facade_lines = [
+        f"État de façade renseigné : {etat_facade}",
+        f"Support principal : {support_key}",
+        f"Solution de ravalement : {sol_txt}",
+    ]
+    pdf.multi_cell(190, 6, safe("\n".join(facade_lines)))
 
     pdf.ln(5)
     pdf.set_font("Helvetica", "B", 12)
-    pdf.multi_cell(190, 7, safe(f"Montant estimatif indicatif : {fmt_eur_ttc(total_ttc)}"))
+    pdf.multi_cell(190, 7, safe(f"Montant estimatif indicatif : {fmt_eur(total_ttc, 'EUR TTC', 2)}"))
     pdf.set_font("Helvetica", "", 9)
     pdf.multi_cell(
         190,
         5,
-        safe(f"(Equivalent ~ {total_ht:,.2f} EUR HT)".replace(",", " ").replace(".", ",")),
+        safe(f"(Equivalent ~ {fmt_eur(total_ht, 'EUR HT', 2)})"),
     )
     pdf.ln(2)
     pdf.multi_cell(
@@ -194,42 +392,22 @@ def generate_pdf_estimation(
         ),
     )
 
-    familles_labels = {
-        "INSTALLATION": "Installation de chantier",
-        "PREPARATION": "Préparation et protections",
-        "RAVALEMENT": "Travaux de ravalement",
-        "PEINTURE": "Peinture façades / menuiseries / métallerie",
-        "ZINGUERIE": "Zinguerie",
-        "FINITIONS": "Finitions et nettoyage",
-    }
-
-    fam_totaux: Dict[str, float] = {k: 0.0 for k in familles_labels.keys()}
-    famille_lignes: Dict[str, List[Dict]] = {k: [] for k in familles_labels.keys()}
-
-    for l in lignes:
-        fam = l.get("famille", "")
-        if fam in fam_totaux:
-            montant = float(l.get("montant", 0.0) or 0.0)
-            fam_totaux[fam] += montant
-            famille_lignes[fam].append(l)
-
-    for fam_code, fam_label in familles_labels.items():
+    for fam_code, fam_label in FAMILLES_LABELS.items():
         montant_fam = fam_totaux.get(fam_code, 0.0)
         if montant_fam <= 0:
             continue
 
         pdf.ln(4)
         pdf.set_font("Helvetica", "B", 10)
-        pdf.multi_cell(190, 6, safe(f"{fam_label} – {fmt_eur_ttc(montant_fam)}"))
+        pdf.multi_cell(190, 6, safe(f"{fam_label} – {fmt_eur(montant_fam, 'EUR TTC', 2)}"))
         pdf.set_font("Helvetica", "", 9)
 
-        for l in famille_lignes[fam_code]:
-            q = l["quantite"]
-            u = l["unite"]
-            m = l["montant"]
-            txt = f"- {l['designation']} ({q} {u}) : {m:,.2f} EUR TTC"
-            txt = txt.replace(",", " ").replace(".", ",")
-            pdf.multi_cell(190, 4, safe(txt))
+        # Lignes de la famille en un seul multi_cell
+        details = [
+            f"- {l['designation']} ({l['quantite']} {l['unite']}) : {l['montant']:,.2f} EUR TTC".translate(EUR_TRANS)
+            for l in famille_lignes[fam_code]
+        ]
+        pdf.multi_cell(190, 4, safe("\n".join(details)))
 
     pdf.ln(8)
     pdf.set_font("Helvetica", "", 8)
@@ -242,22 +420,64 @@ def generate_pdf_estimation(
         ),
     )
 
-    raw = pdf.output(dest="S")
-    if isinstance(raw, bytes):
-        return raw
-    if isinstance(raw, bytearray):
-        return bytes(raw)
-    if isinstance(raw, str):
-        return raw.encode("latin-1", "replace")
-    try:
-        return bytes(raw)
-    except Exception:
-        return None
+    # fpdf2 >= 2.7 : output() renvoie toujours un bytearray
+    return bytes(pdf.output())
+
+
+def cached_pdf_estimation(**kwargs) -> Optional[bytes]:
+    """
+    PDF mis en cache sur une empreinte de ses entrées : un rerun de l'étape 4
+    (clic sur le bouton de téléchargement...) ne régénère pas le document.
+    """
+    payload = json.dumps(kwargs, sort_keys=True, default=str).encode("utf-8")
+    cache_key = hashlib.blake2b(payload, digest_size=16).hexdigest()
+    return _pdf_cached(cache_key, kwargs)
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _pdf_cached(cache_key: str, _kwargs: Dict) -> Optional[bytes]:
+    # _kwargs n'est pas haché par Streamlit (préfixe "_") : seule cache_key fait foi
+    return generate_pdf_estimation(**_kwargs)
 
 
 # ----------------------------------------------------------------------
 # Calcul géométrie + options
 # ----------------------------------------------------------------------
+# Linéaire de façades traitées et nombre de façades selon (type, zone) :
+# fonctions de (largeur rue, largeur cour, profondeur) -> (périmètre, nb).
+_ZONE_TABLE = {
+    ("PAVILLON", "rue"): lambda rue, cour, prof: (rue, 1),
+    ("PAVILLON", "cour"): lambda rue, cour, prof: (cour, 1),
+    ("IMMEUBLE", "rue"): lambda rue, cour, prof: (rue, 1),
+    ("IMMEUBLE", "cour"): lambda rue, cour, prof: (cour, 1),
+    ("IMMEUBLE", "rue+cour"): lambda rue, cour, prof: (rue + cour, 2),
+}
+# Zone non listée : pavillon traité sur tout son pourtour, immeuble sans façade
+_ZONE_FALLBACK = {
+    "PAVILLON": lambda rue, cour, prof: (2 * (rue + prof), 4),
+    "IMMEUBLE": lambda rue, cour, prof: (0.0, 0),
+}
+
+
+# Options de chiffrage par défaut (rien d'inventé : zinguerie à 0 tant
+# qu'elle n'est pas saisie) ; seules les valeurs issues des formulaires
+# sont écrasées à chaque calcul.
+_DEFAULT_PRICING_OPTIONS = MappingProxyType(
+    {
+        "is_haussmann": False,
+        "niveaux": 5,
+        "nb_fenetres_grandes": 0,
+        "ml_garde_corps_fer_forge": 0.0,
+        "traiter_chiens_assis": False,
+        "nb_chiens_assis": 0,
+        "ml_couvertine": 0.0,
+        "ml_bandeaux": 0.0,
+        "ml_descente_ep": 0.0,
+        "solution_ravalement": "PEINTURE",
+    }
+)
+
+
 def compute_geometry_and_options(
     dims: Dict,
     facade_state: Dict,
@@ -278,38 +498,16 @@ def compute_geometry_and_options(
     building_type = dims.get("building_type", "IMMEUBLE")
     has_pignon = bool(dims.get("has_pignon", False))
 
-    if building_type == "PAVILLON":
-        if zone_choice == "rue":
-            surface = hauteur * largeur_rue
-            perimetre = largeur_rue
-            nb_facades = 1
-        elif zone_choice == "cour":
-            surface = hauteur * largeur_cour
-            perimetre = largeur_cour
-            nb_facades = 1
-        else:
-            perimetre = 2 * (largeur_rue + profondeur)
-            surface = hauteur * perimetre
-            nb_facades = 4
-    else:
-        surface = 0.0
-        perimetre = 0.0
-        nb_facades = 0
+    kind = "PAVILLON" if building_type == "PAVILLON" else "IMMEUBLE"
+    zone_fn = _ZONE_TABLE.get((kind, zone_choice)) or _ZONE_FALLBACK[kind]
+    perimetre, nb_facades = zone_fn(largeur_rue, largeur_cour, profondeur)
 
-        if zone_choice in ("rue", "rue+cour"):
-            surface += hauteur * largeur_rue
-            perimetre += largeur_rue
-            nb_facades += 1
+    # Pignon : ne concerne que les immeubles
+    if kind == "IMMEUBLE" and has_pignon:
+        perimetre += profondeur
+        nb_facades += 1
 
-        if zone_choice in ("cour", "rue+cour"):
-            surface += hauteur * largeur_cour
-            perimetre += largeur_cour
-            nb_facades += 1
-
-        if has_pignon:
-            surface += hauteur * profondeur
-            perimetre += profondeur
-            nb_facades += 1
+    surface = hauteur * perimetre
 
     geom = Geometry(
         hauteur=float(hauteur),
@@ -318,14 +516,6 @@ def compute_geometry_and_options(
         nb_facades=int(max(nb_facades, 1)),
     )
 
-    # Options pour pricing
-    options: Dict = {}
-    options["is_haussmann"] = bool(osm_ctx.get("is_haussmann_suspected", False))
-    options["niveaux"] = niveaux
-
-    # Seules les grandes fenêtres comptent
-    options["nb_fenetres_grandes"] = int(facade_state.get("nb_fenetres_grandes", 0))
-
     # Garde-corps : estimation simple sur le périmètre
     garde_corps_niveau = facade_state.get("garde_corps_niveau", "moyen")
     if garde_corps_niveau == "peu":
@@ -334,18 +524,22 @@ def compute_geometry_and_options(
         ml_gc = perimetre * 0.8
     else:
         ml_gc = perimetre * 0.5
-    options["ml_garde_corps_fer_forge"] = ml_gc
-
-    options["traiter_chiens_assis"] = bool(facade_state.get("traiter_chiens_assis", False))
-    options["nb_chiens_assis"] = int(facade_state.get("nb_chiens_assis", 0))
-
-    # Zinguerie : par défaut, 0 (à ajuster plus tard si besoin)
-    options["ml_couvertine"] = 0.0
-    options["ml_bandeaux"] = 0.0
-    options["ml_descente_ep"] = 0.0
 
-    # Solution de ravalement (peinture ou enduit sans peinture)
-    options["solution_ravalement"] = facade_state.get("solution_ravalement", "PEINTURE")
+    # Options pour pricing (zinguerie laissée aux valeurs par défaut)
+    options: Dict = dict(_DEFAULT_PRICING_OPTIONS)
+    options.update(
+        {
+            "is_haussmann": bool(osm_ctx.get("is_haussmann_suspected", False)),
+            "niveaux": niveaux,
+            # Seules les grandes fenêtres comptent
+            "nb_fenetres_grandes": int(facade_state.get("nb_fenetres_grandes", 0)),
+            "ml_garde_corps_fer_forge": ml_gc,
+            "traiter_chiens_assis": bool(facade_state.get("traiter_chiens_assis", False)),
+            "nb_chiens_assis": int(facade_state.get("nb_chiens_assis", 0)),
+            # Solution de ravalement (peinture ou enduit sans peinture)
+            "solution_ravalement": facade_state.get("solution_ravalement", "PEINTURE"),
+        }
+    )
 
     etat_facade = facade_state.get("etat_facade", "moyen")
     support_key = facade_state.get("support_key", "ENDUIT_CIMENT")
@@ -353,60 +547,108 @@ def compute_geometry_and_options(
     return geom, options, etat_facade, support_key
 
 
+@st.cache_data(show_spinner=False, max_entries=64)
+def compute_estimation(
+    dims: Dict,
+    facade_state: Dict,
+    zone_choice: str,
+    osm_ctx: Dict,
+) -> Tuple[Geometry, List[Dict], float]:
+    """
+    Géométrie + chiffrage détaillé, mis en cache sur les entrées des
+    formulaires : un rerun sans changement ne refait pas le calcul.
+    Retourne (geom, lignes, total_ttc).
+    """
+    geom, options, etat_facade, support_key = compute_geometry_and_options(
+        dims, facade_state, zone_choice, osm_ctx
+    )
+    lignes, total_ttc = build_pricing(
+        geom=geom,
+        support_key=support_key,
+        options=options,
+        etat_facade=etat_facade,
+    )
+    return geom, lignes, total_ttc
+
+
 # ----------------------------------------------------------------------
-# Main
+# Étape 0 – Adresse (fragment)
 # ----------------------------------------------------------------------
-def main() -> None:
-    init_state()
+@st.fragment
+def address_step() -> None:
+    """
+    Saisie de l'adresse isolée dans un fragment : une interaction avec le
+    champ ne relance que ce bloc. La validation déclenche un rerun complet
+    pour passer à l'étape 1.
+    """
+    ok = ui.render_address_step()
+    if not ok:
+        return
 
-    st.markdown(
-        "<h2 style='margin-bottom:0.5rem; color:#0B2239;'>Estimateur de ravalement – Libert &amp; Cie</h2>",
-        unsafe_allow_html=True,
-    )
-    st.markdown(
-        "<p style='color:#555; margin-bottom:1.5rem;'>"
-        "Un ordre de grandeur indicatif pour votre ravalement de façade, à confirmer après visite sur place."
-        "</p>",
-        unsafe_allow_html=True,
+    addr = st.session_state.get("addr_label") or ""
+    coords = geocode_address(addr)
+    if coords:
+        st.session_state.coords = coords
+        st.session_state.streetview_url = build_streetview_embed_url(
+            coords["lat"], coords["lon"], GOOGLE_API_KEY
+        )
+        ctx = get_osm_context(coords["lat"], coords["lon"])
+        st.session_state.osm_ctx = ctx
+    else:
+        st.warning("Géolocalisation non disponible. L'estimation se fera sans Street View ni données OSM.")
+        st.session_state.coords = None
+        st.session_state.streetview_url = None
+        st.session_state.osm_ctx = {}
+    st.session_state.step = 1
+    st.rerun(scope="app")
+
+
+# ----------------------------------------------------------------------
+# Étape 4 – Téléchargement du PDF (fragment)
+# ----------------------------------------------------------------------
+@st.fragment
+def pdf_download(pdf_bytes: bytes) -> None:
+    """
+    Bouton de téléchargement isolé dans un fragment : le clic ne relance
+    que ce bloc, sans réafficher les résultats ni recharger le Street View.
+    """
+    st.download_button(
+        "Télécharger le PDF",
+        data=pdf_bytes,
+        file_name="Estimation_Libert.pdf",
+        mime="application/pdf",
+        type="secondary",
     )
 
-    step = st.session_state.step
-
-    # ------------------------------------------------------------------
-    # Étape 0 – Adresse
-    # ------------------------------------------------------------------
-    if step == 0:
-        ok = ui.render_address_step()
-        if ok:
-            addr = st.session_state.get("addr_label") or ""
-            coords = geocode_address(addr)
-            if coords:
-                st.session_state.coords = coords
-                ctx = fetch_osm_context(coords["lat"], coords["lon"])
-                st.session_state.osm_ctx = ctx
-            else:
-                st.warning("Géolocalisation non disponible. L'estimation se fera sans Street View ni données OSM.")
-                st.session_state.coords = None
-                st.session_state.osm_ctx = {}
-            st.session_state.step = 1
-            st.rerun()
+
+# ----------------------------------------------------------------------
+# Étape 4 – Suivi de l'envoi de l'e-mail (fragment)
+# ----------------------------------------------------------------------
+@st.fragment(run_every=1.0)
+def mail_status() -> None:
+    """
+    Affiché tant que l'envoi est en cours : se relance chaque seconde,
+    puis relance la page une fois l'envoi terminé pour afficher le résultat.
+    """
+    fut = st.session_state.mail_future
+    if fut is not None and not fut.done():
+        st.info("Envoi de l’estimation par e-mail en cours…")
         return
+    st.rerun()
 
-    coords = st.session_state.get("coords")
-    if not coords:
-        st.warning("Géolocalisation non disponible. L'estimation se fera sans Street View ni données OSM.")
-        st.session_state.osm_ctx = st.session_state.osm_ctx or {}
-
-    # ------------------------------------------------------------------
-    # Étape 1 – Dimensions
-    # ------------------------------------------------------------------
-    if step == 1:
-        osm_ctx = st.session_state.osm_ctx or {}
-        dims = ui.render_map_and_form(GOOGLE_API_KEY, ui.render_building_dimensions_form, osm_ctx)
-        if dims is None:
-            return
 
-        st.markdown('<div class="lc-card">', unsafe_allow_html=True)
+# ----------------------------------------------------------------------
+# Étape 1 – Dimensions
+# ----------------------------------------------------------------------
+@st.fragment
+def dimensions_step() -> None:
+    state = st.session_state
+    osm_ctx = state.osm_ctx or {}
+    dims = ui.render_map_and_form(GOOGLE_API_KEY, ui.render_building_dimensions_form, osm_ctx)
+    if dims is None:
+        return
+
+    with ui.card():
         zone_default = "rue+cour" if osm_ctx.get("has_cour") else "rue"
         zone_labels = {
             "rue": "Façade sur rue",
@@ -419,162 +661,134 @@ def main() -> None:
             index=["rue", "cour", "rue+cour"].index(zone_default),
             format_func=lambda z: zone_labels[z],
         )
-        st.markdown("</div>", unsafe_allow_html=True)
-
-        # Preview prix étape 1 (hypothèses standard)
-        facade_state_preview = {
-            "etat_facade": "moyen",
-            "support_key": "ENDUIT_CIMENT",
-            "solution_ravalement": "PEINTURE",
-            "nb_fenetres_grandes": 0,
-            "garde_corps_niveau": "moyen",
-            "traiter_chiens_assis": False,
-            "nb_chiens_assis": 0,
-        }
-        geom_preview, options_preview, etat_prev, support_prev = compute_geometry_and_options(
-            dims, facade_state_preview, zone_choice, osm_ctx
-        )
-        _, total_ttc_preview = build_pricing(
-            geom=geom_preview,
-            support_key=support_prev,
-            options=options_preview,
-            etat_facade=etat_prev,
-        )
-        ui.render_price_banner(total_ttc_preview, "Estimation provisoire")
-
-        col_next, col_back = st.columns([1, 1])
-        with col_next:
-            if st.button("Étape suivante : état de la façade", type="primary"):
-                st.session_state.building_dims = dims
-                st.session_state.zone_choice = zone_choice
-                st.session_state.step = 2
-                st.rerun()
-        with col_back:
-            if st.button("Retour"):
-                st.session_state.step = 0
-                st.rerun()
-        return
 
-    # ------------------------------------------------------------------
-    # Étape 2 – État de façade / éléments
-    # ------------------------------------------------------------------
-    if step == 2:
-        osm_ctx = st.session_state.osm_ctx or {}
-        dims = st.session_state.building_dims or {}
-        if not dims:
-            st.session_state.step = 1
+    # Preview prix étape 1 (hypothèses standard)
+    facade_state_preview = {
+        "etat_facade": "moyen",
+        "support_key": "ENDUIT_CIMENT",
+        "solution_ravalement": "PEINTURE",
+        "nb_fenetres_grandes": 0,
+        "garde_corps_niveau": "moyen",
+        "traiter_chiens_assis": False,
+        "nb_chiens_assis": 0,
+    }
+    _, _, total_ttc_preview = compute_estimation(dims, facade_state_preview, zone_choice, osm_ctx)
+    ui.render_price_banner(total_ttc_preview, "Estimation provisoire")
+
+    col_next, col_back = st.columns([1, 1])
+    with col_next:
+        if st.button("Étape suivante : état de la façade", type="primary"):
+            state.building_dims = dims
+            state.zone_choice = zone_choice
+            state.step = 2
+            st.rerun()
+    with col_back:
+        if st.button("Retour"):
+            state.step = 0
             st.rerun()
-            return
 
-        facade_state = ui.render_map_and_form(GOOGLE_API_KEY, ui.render_facade_state_form, osm_ctx)
-        if facade_state is None:
-            return
 
-        zone_choice = st.session_state.get("zone_choice", "rue")
-        geom_prev, options_prev, etat_prev, support_prev = compute_geometry_and_options(
-            dims, facade_state, zone_choice, osm_ctx
-        )
-        _, total_ttc_prev = build_pricing(
-            geom=geom_prev,
-            support_key=support_prev,
-            options=options_prev,
-            etat_facade=etat_prev,
-        )
-        ui.render_price_banner(total_ttc_prev, "Estimation actualisée")
-
-        col_next, col_back = st.columns([1, 1])
-        with col_next:
-            if st.button("Étape suivante : vos coordonnées", type="primary"):
-                st.session_state.facade_state = facade_state
-                st.session_state.step = 3
-                st.rerun()
-        with col_back:
-            if st.button("Retour"):
-                st.session_state.step = 1
-                st.rerun()
+# ----------------------------------------------------------------------
+# Étape 2 – État de façade / éléments
+# ----------------------------------------------------------------------
+@st.fragment
+def facade_step() -> None:
+    state = st.session_state
+    osm_ctx = state.osm_ctx or {}
+    dims = state.building_dims or {}
+    if not dims:
+        state.step = 1
+        st.rerun()
         return
 
-    # ------------------------------------------------------------------
-    # Étape 3 – Coordonnées
-    # ------------------------------------------------------------------
-    if step == 3:
-        osm_ctx = st.session_state.osm_ctx or {}
-        dims = st.session_state.building_dims or {}
-        facade_state = st.session_state.facade_state or {}
-        zone_choice = st.session_state.get("zone_choice", "rue")
-
-        geom_prev, options_prev, etat_prev, support_prev = compute_geometry_and_options(
-            dims, facade_state, zone_choice, osm_ctx
-        )
-        _, total_ttc_prev = build_pricing(
-            geom=geom_prev,
-            support_key=support_prev,
-            options=options_prev,
-            etat_facade=etat_prev,
-        )
-
-        contact = ui.render_map_and_form(GOOGLE_API_KEY, ui.render_contact_form, osm_ctx)
-        if contact is None:
-            return
+    facade_state = ui.render_map_and_form(GOOGLE_API_KEY, ui.render_facade_state_form, osm_ctx)
+    if facade_state is None:
+        return
 
-        ui.render_price_banner(total_ttc_prev, "Estimation actuelle")
+    zone_choice = state.get("zone_choice", "rue")
+    _, _, total_ttc_prev = compute_estimation(dims, facade_state, zone_choice, osm_ctx)
+    ui.render_price_banner(total_ttc_prev, "Estimation actualisée")
 
-        disabled = not contact.get("email") or not contact.get("nom")
-        if st.button("Calculer l’estimation détaillée et recevoir le PDF", type="primary", disabled=disabled):
-            st.session_state.contact = contact
-            st.session_state.step = 4
+    col_next, col_back = st.columns([1, 1])
+    with col_next:
+        if st.button("Étape suivante : vos coordonnées", type="primary"):
+            state.facade_state = facade_state
+            state.step = 3
             st.rerun()
-        if st.button("Retour à l’étape précédente"):
-            st.session_state.step = 2
+    with col_back:
+        if st.button("Retour"):
+            state.step = 1
             st.rerun()
+
+
+# ----------------------------------------------------------------------
+# Étape 3 – Coordonnées
+# ----------------------------------------------------------------------
+@st.fragment
+def contact_step() -> None:
+    state = st.session_state
+    osm_ctx = state.osm_ctx or {}
+    dims = state.building_dims or {}
+    facade_state = state.facade_state or {}
+    zone_choice = state.get("zone_choice", "rue")
+
+    _, _, total_ttc_prev = compute_estimation(dims, facade_state, zone_choice, osm_ctx)
+
+    contact = ui.render_map_and_form(GOOGLE_API_KEY, ui.render_contact_form, osm_ctx)
+    if contact is None:
         return
 
-    # ------------------------------------------------------------------
-    # Étape 4 – Résultat final, email, PDF
-    # ------------------------------------------------------------------
-    if step == 4:
-        coords = st.session_state.get("coords")
-        osm_ctx = st.session_state.osm_ctx or {}
-        dims = st.session_state.building_dims or {}
-        facade_state = st.session_state.facade_state or {}
-        contact = st.session_state.contact or {}
-        zone_choice = st.session_state.get("zone_choice", "rue")
-
-        if not dims or not facade_state or not contact:
-            st.session_state.step = 0
-            st.rerun()
-            return
+    ui.render_price_banner(total_ttc_prev, "Estimation actuelle")
 
-        geom, options, etat_facade, support_key = compute_geometry_and_options(
-            dims, facade_state, zone_choice, osm_ctx
-        )
+    disabled = not contact.get("email") or not contact.get("nom")
+    if st.button("Calculer l’estimation détaillée et recevoir le PDF", type="primary", disabled=disabled):
+        state.contact = contact
+        state.step = 4
+        st.rerun()
+    if st.button("Retour à l’étape précédente"):
+        state.step = 2
+        st.rerun()
 
-        lignes, total_ttc = build_pricing(
-            geom=geom,
-            support_key=support_key,
-            options=options,
-            etat_facade=etat_facade,
-        )
 
-        st.success("Estimation calculée (indicative, à confirmer après visite sur place).")
+# ----------------------------------------------------------------------
+# Étape 4 – Résultat final, email, PDF
+# ----------------------------------------------------------------------
+@st.fragment
+def result_step() -> None:
+    state = st.session_state
+    osm_ctx = state.osm_ctx or {}
+    dims = state.building_dims or {}
+    facade_state = state.facade_state or {}
+    contact = state.contact or {}
+    zone_choice = state.get("zone_choice", "rue")
+
+    if not dims or not facade_state or not contact:
+        state.step = 0
+        st.rerun()
+        return
+
+    geom, lignes, total_ttc = compute_estimation(dims, facade_state, zone_choice, osm_ctx)
 
-        col_map, col_res = st.columns([1, 1.3])
+    fam_totaux, famille_lignes = group_by_famille(lignes)
 
-        with col_map:
-            st.markdown('<div class="lc-card">', unsafe_allow_html=True)
-            st.markdown(f"<b>Adresse :</b><br>{st.session_state.addr_label}", unsafe_allow_html=True)
-            if coords and GOOGLE_API_KEY:
-                iframe = build_streetview_embed_url(coords["lat"], coords["lon"], GOOGLE_API_KEY)
+    st.success("Estimation calculée (indicative, à confirmer après visite sur place).")
+
+    col_map, col_res = st.columns([1, 1.3])
+
+    with col_map:
+        with ui.card():
+            st.markdown(f"<b>Adresse :</b><br>{state.addr_label}", unsafe_allow_html=True)
+            iframe = state.get("streetview_url")
+            if iframe:
                 st.markdown(
                     f'<iframe src="{iframe}" width="100%" height="300" style="border:0;border-radius:14px;" '
                     f'allowfullscreen loading="lazy"></iframe>',
                     unsafe_allow_html=True,
                 )
-            st.markdown("</div>", unsafe_allow_html=True)
 
-        with col_res:
-            st.markdown('<div class="lc-card">', unsafe_allow_html=True)
-            total_txt = f"{total_ttc:,.0f} € TTC".replace(",", " ").replace(".", ",")
+    with col_res:
+        with ui.card():
+            total_txt = fmt_eur(total_ttc)
             st.markdown("<b>Montant estimatif indicatif :</b>", unsafe_allow_html=True)
             st.markdown(
                 f"<p style='font-size:1.4rem; font-weight:700; color:#0B2239;'>{total_txt}</p>",
@@ -588,79 +802,125 @@ def main() -> None:
                 unsafe_allow_html=True,
             )
 
-            fam_labels = {
-                "INSTALLATION": "Installation de chantier",
-                "PREPARATION": "Préparation et protections",
-                "RAVALEMENT": "Travaux de ravalement",
-                "PEINTURE": "Peinture façades / menuiseries / métallerie",
-                "ZINGUERIE": "Zinguerie",
-                "FINITIONS": "Finitions et nettoyage",
-            }
-            fam_totaux = {k: 0.0 for k in fam_labels.keys()}
-            fam_lines: Dict[str, List[Dict]] = {k: [] for k in fam_labels.keys()}
-
-            for l in lignes:
-                fam = l.get("famille", "")
-                if fam in fam_labels:
-                    fam_totaux[fam] += float(l.get("montant", 0.0) or 0.0)
-                    fam_lines[fam].append(l)
-
-            for code, label in fam_labels.items():
+            for code, label in FAMILLES_LABELS.items():
                 montant = fam_totaux.get(code, 0.0)
                 if montant <= 0:
                     continue
-                txt = f"{label} : {montant:,.0f} € TTC".replace(",", " ").replace(".", ",")
-                st.markdown(f"### {txt}")
-                for l in fam_lines[code]:
+                # Titre + lignes de la famille en un seul bloc markdown
+                bloc = [f"### {label} : {fmt_eur(montant)}"]
+                for l in famille_lignes[code]:
                     q = l["quantite"]
                     u = l["unite"]
                     m = l["montant"]
-                    line_txt = f"- {l['designation']} ({q} {u}) : {m:,.0f} € TTC"
-                    line_txt = line_txt.replace(",", " ").replace(".", ",")
-                    st.markdown(line_txt)
-            st.markdown("</div>", unsafe_allow_html=True)
-
-        pdf_bytes = generate_pdf_estimation(
-            addr_label=st.session_state.addr_label,
-            geom=geom,
-            lignes=lignes,
-            total_ttc=total_ttc,
-            facade_state=facade_state,
-            dims=dims,
-            zone_choice=zone_choice,
-            contact=contact,
-            osm_ctx=osm_ctx,
-        )
+                    bloc.append(f"- {l['designation']} ({q} {u}) : {m:,.0f} € TTC".translate(EUR_TRANS))
+                st.markdown("\n".join(bloc))
+
+    pdf_bytes = cached_pdf_estimation(
+        addr_label=state.addr_label,
+        geom=geom,
+        total_ttc=total_ttc,
+        fam_totaux=fam_totaux,
+        famille_lignes=famille_lignes,
+        facade_state=facade_state,
+        dims=dims,
+        zone_choice=zone_choice,
+        contact=contact,
+        osm_ctx=osm_ctx,
+    )
 
-        if SMTP_CONF["host"] and SMTP_CONF["user"] and contact.get("email"):
-            try:
-                send_estimation_email(
-                    smtp_conf=SMTP_CONF,
-                    contact=contact,
-                    addr_label=st.session_state.addr_label,
-                    total_ttc=total_ttc,
-                    pdf_bytes=pdf_bytes,
-                )
-                st.info("L’estimation a été envoyée par e-mail (copie à contact@libertsas.fr).")
-            except Exception as e:
-                st.warning(f"Erreur lors de l’envoi de l’e-mail : {e}")
-        else:
-            st.info("Configuration SMTP incomplète : l’envoi automatique par e-mail n’est pas actif.")
-
-        if pdf_bytes:
-            st.download_button(
-                "Télécharger le PDF",
-                data=pdf_bytes,
-                file_name="Estimation_Libert.pdf",
-                mime="application/pdf",
-                type="secondary",
+    if SMTP_ENABLED and contact.get("email"):
+        # Empreinte de la demande : une même saisie n'est envoyée qu'une fois
+        # (reruns, double clic, page rechargée à l'étape 4)
+        payload = json.dumps(
+            [state.addr_label, dims, facade_state, zone_choice, contact],
+            sort_keys=True,
+            default=str,
+        ).encode("utf-8")
+        mail_key = hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+        fut = state.mail_future
+        if fut is None and state.mail_key != mail_key:
+            # Import différé : smtplib / email ne sont chargés qu'à l'étape finale
+            from email_utils import send_estimation_email
+
+            fut = _mail_pool().submit(
+                send_estimation_email,
+                smtp_conf=SMTP_CONF,
+                contact=contact,
+                addr_label=state.addr_label,
+                total_ttc=total_ttc,
+                pdf_bytes=pdf_bytes,
             )
+            state.mail_future = fut
+            state.mail_pending_key = mail_key
+
+        if fut is None:
+            st.info("L’estimation a déjà été envoyée par e-mail pour cette demande.")
+        elif not fut.done():
+            mail_status()
+        elif fut.exception() is not None:
+            st.warning(f"Erreur lors de l’envoi de l’e-mail : {fut.exception()}")
+            # Échec : on oublie cet envoi pour que le prochain passage le retente
+            state.mail_future = None
+            state.mail_pending_key = None
+            state.mail_key = None
+        else:
+            # L'empreinte n'est enregistrée qu'une fois l'envoi réussi
+            if state.mail_key != state.mail_pending_key:
+                state.mail_key = state.mail_pending_key
+                save_state()
+            st.info("L’estimation a été envoyée par e-mail (copie à contact@libertsas.fr).")
+    else:
+        st.info("Configuration SMTP incomplète : l’envoi automatique par e-mail n’est pas actif.")
 
-        if st.button("Faire une nouvelle estimation"):
-            for k in list(st.session_state.keys()):
-                del st.session_state[k]
-            init_state()
-            st.rerun()
+    if pdf_bytes:
+        pdf_download(pdf_bytes)
+
+    if st.button("Faire une nouvelle estimation"):
+        reset_state()
+        st.rerun()
+
+
+# ----------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------
+# Une fonction par étape : main() n'appelle que celle de l'étape courante.
+# Chaque étape est un fragment : une saisie ne relance que l'étape affichée,
+# les changements d'étape passent par st.rerun() (portée application).
+_STEPS = {
+    0: address_step,
+    1: dimensions_step,
+    2: facade_step,
+    3: contact_step,
+    4: result_step,
+}
+
+
+def main() -> None:
+    init_state()
+    state = st.session_state
+
+    st.markdown(
+        "<h2 style='margin-bottom:0.5rem; color:#0B2239;'>Estimateur de ravalement – Libert &amp; Cie</h2>",
+        unsafe_allow_html=True,
+    )
+    st.markdown(
+        "<p style='color:#555; margin-bottom:1.5rem;'>"
+        "Un ordre de grandeur indicatif pour votre ravalement de façade, à confirmer après visite sur place."
+        "</p>",
+        unsafe_allow_html=True,
+    )
+
+    step = state.step
+    if step != state.get("_saved_step"):
+        save_state()
+        state["_saved_step"] = step
+
+    if step != 0 and not state.get("coords"):
+        st.warning("Géolocalisation non disponible. L'estimation se fera sans Street View ni données OSM.")
+        state.osm_ctx = state.osm_ctx or {}
+
+    _STEPS[step]()
 
 
 if __name__ == "__main__":
@@ -1,39 +1,86 @@
 import smtplib
+import threading
 from email.message import EmailMessage
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 
+from pricing import fmt_eur
 
-def send_estimation_email(
-    smtp_conf: Dict,
-    contact: Dict,
-    addr_label: str,
-    total_ttc: float,
-    pdf_bytes: Optional[bytes],
-) -> None:
-    """
-    Envoie l'e-mail d'estimation au prospect, avec le PDF en PJ,
-    et une copie à contact@libertsas.fr.
-    """
-    nom = contact.get("nom") or ""
-    email = contact.get("email") or ""
-    tel = contact.get("tel") or ""
-    delai_mois = contact.get("delai_mois")
-    urgent = contact.get("urgent", False)
 
-    if not email:
-        return
+# Connexion SMTP authentifiée réutilisée d'un envoi à l'autre (le module
+# n'est chargé qu'une fois par process). Le verrou sérialise son usage
+# entre les threads d'envoi.
+_smtp_lock = threading.Lock()
+_smtp_conn: Optional[smtplib.SMTP] = None
+_smtp_key: Optional[Tuple] = None
+_smtp_sent = 0
 
-    total_txt = f"{total_ttc:,.0f} € TTC".replace(",", " ").replace(".", ",")
+# Au-delà, la connexion est recyclée (limites des fournisseurs par session)
+_SMTP_MAX_MESSAGES = 100
+# Délai max (s) de connexion et de chaque échange SMTP : un serveur muet ne bloque pas le pool
+_SMTP_TIMEOUT = 15
 
-    sujet = "Votre estimation de ravalement – Libert & Cie"
-    expediteur = smtp_conf.get("user") or "contact@libertsas.fr"
-    destinataires = [email, "contact@libertsas.fr"]
 
-    # Corps HTML
-    urgent_txt = "Oui" if urgent else "Non"
-    tel_txt = f"<p>Téléphone : {tel}</p>" if tel else ""
+def _close_connection() -> None:
+    global _smtp_conn, _smtp_key, _smtp_sent
+    if _smtp_conn is not None:
+        try:
+            _smtp_conn.quit()
+        except Exception:
+            pass
+    _smtp_conn = None
+    _smtp_key = None
+    _smtp_sent = 0
+
 
-    html_body = f"""
+def _get_connection(host: str, port: int, user: str, password: str, use_tls: bool) -> smtplib.SMTP:
+    """
+    Renvoie la connexion ouverte si elle répond encore au NOOP et n'a pas
+    atteint _SMTP_MAX_MESSAGES, sinon en ouvre une nouvelle (STARTTLS ou
+    SSL, puis login).
+    À appeler sous _smtp_lock.
+    """
+    global _smtp_conn, _smtp_key
+    key = (host, port, user, use_tls)
+    if _smtp_conn is not None and _smtp_key == key and _smtp_sent < _SMTP_MAX_MESSAGES:
+        try:
+            if _smtp_conn.noop()[0] == 250:
+                return _smtp_conn
+        except (smtplib.SMTPException, OSError):
+            pass
+
+    _close_connection()
+    # Port 465 : TLS implicite dès la connexion, un aller-retour de moins que STARTTLS
+    if use_tls and port != 465:
+        server = smtplib.SMTP(host, port, timeout=_SMTP_TIMEOUT)
+    else:
+        server = smtplib.SMTP_SSL(host, port, timeout=_SMTP_TIMEOUT)
+    try:
+        if use_tls and port != 465:
+            server.starttls()
+        server.login(user, password)
+    except Exception:
+        server.close()
+        raise
+    _smtp_conn = server
+    _smtp_key = key
+    return server
+
+
+def _send(msg: EmailMessage, host: str, port: int, user: str, password: str, use_tls: bool) -> None:
+    global _smtp_sent
+    with _smtp_lock:
+        server = _get_connection(host, port, user, password, use_tls)
+        try:
+            server.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Coupure entre le NOOP et l'envoi : une seule nouvelle tentative
+            _close_connection()
+            _get_connection(host, port, user, password, use_tls).send_message(msg)
+        _smtp_sent += 1
+
+
+# Corps HTML de l'e-mail prospect, rempli par format_map à chaque envoi
+_HTML_TMPL = """
     <html>
       <body style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif; color:#111827;">
         <div style="max-width:600px;margin:0 auto;padding:24px 16px;">
@@ -41,7 +88,7 @@ def send_estimation_email(
             <img src="https://www.libertsas.fr/wp-content/uploads/2023/04/cropped-logo-libert-1.png"
                  alt="Libert & Cie" style="max-height:60px;">
           </div>
-          <h2 style="font-size:20px;margin-bottom:8px;">Bonjour {nom or "Madame, Monsieur"},</h2>
+          <h2 style="font-size:20px;margin-bottom:8px;">Bonjour {salutation},</h2>
           <p style="font-size:14px;line-height:1.5;">
             Merci pour votre demande d'estimation de ravalement de façade.
           </p>
@@ -81,17 +128,81 @@ def send_estimation_email(
         </div>
       </body>
     </html>
+"""
+
+
+# Version texte (clients mail sans HTML)
+_TEXT_TMPL = (
+    "Bonjour {salutation},\n\n"
+    "Vous trouverez ci-joint l'estimation de ravalement pour : {addr_label}.\n"
+    "Montant estimatif : {total_txt}.\n\n"
+    "Bien cordialement,\nLibert & Cie"
+)
+
+
+def send_estimation_email(
+    smtp_conf: Dict,
+    contact: Dict,
+    addr_label: str,
+    total_ttc: float,
+    pdf_bytes: Optional[bytes],
+) -> None:
+    """
+    Envoie l'e-mail d'estimation au prospect, avec le PDF en PJ,
+    et une copie à contact@libertsas.fr.
     """
+    nom = contact.get("nom") or ""
+    email = contact.get("email") or ""
+    tel = contact.get("tel") or ""
+    delai_mois = contact.get("delai_mois")
+    urgent = contact.get("urgent", False)
+
+    if not email:
+        return
+
+    host = smtp_conf.get("host")
+    port = int(smtp_conf.get("port", 587))
+    user = smtp_conf.get("user")
+    password = smtp_conf.get("password")
+    use_tls = bool(smtp_conf.get("use_tls", True))
+
+    # Configuration incomplète : inutile de construire le message
+    if not host or not user or not password:
+        return
+
+    total_txt = fmt_eur(total_ttc)
+
+    sujet = "Votre estimation de ravalement – Libert & Cie"
+    expediteur = smtp_conf.get("user") or "contact@libertsas.fr"
+    destinataires = [email, "contact@libertsas.fr"]
+
+    # Corps HTML
+    urgent_txt = "Oui" if urgent else "Non"
+    tel_txt = f"<p>Téléphone : {tel}</p>" if tel else ""
+
+    html_body = _HTML_TMPL.format_map(
+        {
+            "salutation": nom or "Madame, Monsieur",
+            "addr_label": addr_label,
+            "total_txt": total_txt,
+            "delai_mois": delai_mois,
+            "urgent_txt": urgent_txt,
+            "tel_txt": tel_txt,
+        }
+    )
 
     msg = EmailMessage()
     msg["Subject"] = sujet
     msg["From"] = expediteur
     msg["To"] = ", ".join(destinataires)
     msg.set_content(
-        f"Bonjour {nom or 'Madame, Monsieur'},\n\n"
-        f"Vous trouverez ci-joint l'estimation de ravalement pour : {addr_label}.\n"
-        f"Montant estimatif : {total_txt}.\n\n"
-        f"Bien cordialement,\nLibert & Cie"
+        _TEXT_TMPL.format_map(
+            {
+                "salutation": nom or "Madame, Monsieur",
+                "addr_label": addr_label,
+                "total_txt": total_txt,
+            }
+        )
     )
     msg.add_alternative(html_body, subtype="html")
 
@@ -104,21 +215,4 @@ def send_estimation_email(
             filename="Estimation_Libert.pdf",
         )
 
-    host = smtp_conf.get("host")
-    port = int(smtp_conf.get("port", 587))
-    user = smtp_conf.get("user")
-    password = smtp_conf.get("password")
-    use_tls = bool(smtp_conf.get("use_tls", True))
-
-    if not host or not user or not password:
-        return
-
-    if use_tls:
-        with smtplib.SMTP(host, port) as server:
-            server.starttls()
-            server.login(user, password)
-            server.send_message(msg)
-    else:
-        with smtplib.SMTP_SSL(host, port) as server:
-            server.login(user, password)
-            server.send_message(msg)
+    _send(msg, host, port, user, password, use_tls)
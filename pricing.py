@@ -2,6 +2,27 @@ from dataclasses import dataclass
 from typing import Dict, List, Tuple
 
 
+# Familles de travaux, dans l'ordre d'affichage (écran et PDF)
+FAMILLES_LABELS: Dict[str, str] = {
+    "INSTALLATION": "Installation de chantier",
+    "PREPARATION": "Préparation et protections",
+    "RAVALEMENT": "Travaux de ravalement",
+    "PEINTURE": "Peinture façades / menuiseries / métallerie",
+    "ZINGUERIE": "Zinguerie",
+    "FINITIONS": "Finitions et nettoyage",
+}
+
+# Format monétaire français en une passe : "12,345.67" -> "12 345,67"
+EUR_TRANS = str.maketrans({",": " ", ".": ","})
+
+
+def fmt_eur(v: float, suffix: str = "€ TTC", decimals: int = 0) -> str:
+    """
+    Montant au format français, ex. fmt_eur(12345.6) -> "12 346 € TTC".
+    """
+    return f"{v:,.{decimals}f} {suffix}".translate(EUR_TRANS)
+
+
 @dataclass
 class Geometry:
     hauteur: float          # hauteur totale de façade (m)
@@ -386,3 +407,21 @@ def build_pricing(
     )
 
     return lignes, total_ttc
+
+
+def group_by_famille(lignes: List[Dict]) -> Tuple[Dict[str, float], Dict[str, List[Dict]]]:
+    """
+    Regroupe les lignes par famille en une seule passe.
+    Retourne (total TTC par famille, lignes par famille) ; les familles
+    inconnues de FAMILLES_LABELS sont ignorées.
+    """
+    totaux: Dict[str, float] = {k: 0.0 for k in FAMILLES_LABELS}
+    par_famille: Dict[str, List[Dict]] = {k: [] for k in FAMILLES_LABELS}
+
+    for l in lignes:
+        fam = l.get("famille", "")
+        if fam in totaux:
+            totaux[fam] += float(l.get("montant", 0.0) or 0.0)
+            par_famille[fam].append(l)
+
+    return totaux, par_famille
@@ -1,38 +1,45 @@
 import streamlit as st
 from typing import Any, Callable, Dict, Optional
 
-from apis import build_streetview_embed_url
+from pricing import fmt_eur
+
+
+_GLOBAL_CSS = """
+<style>
+.lc-bandeau-prix {
+    position: sticky;
+    bottom: 0;
+    z-index: 999;
+    background: #0B2239;
+    color: #ffffff;
+    padding: 0.7rem 1.2rem;
+    border-radius: 12px;
+    margin-top: 0.8rem;
+}
+.lc-bandeau-prix small {
+    color: #cbd5f5;
+}
+</style>
+"""
 
 
 def init_css() -> None:
-    """Style général (sobre, lisible)."""
-    st.markdown(
-        """
-        <style>
-        .lc-card {
-            background: #ffffff;
-            border-radius: 16px;
-            padding: 1.2rem 1.4rem;
-            box-shadow: 0 8px 20px rgba(15, 23, 42, 0.08);
-            margin-bottom: 1rem;
-        }
-        .lc-bandeau-prix {
-            position: sticky;
-            bottom: 0;
-            z-index: 999;
-            background: #0B2239;
-            color: #ffffff;
-            padding: 0.7rem 1.2rem;
-            border-radius: 12px;
-            margin-top: 0.8rem;
-        }
-        .lc-bandeau-prix small {
-            color: #cbd5f5;
-        }
-        </style>
-        """,
-        unsafe_allow_html=True,
-    )
+    """
+    Style général (sobre, lisible).
+    Réémis à chaque rerun : Streamlit retire de la page les éléments qui
+    ne sont pas renvoyés, la feuille de style disparaîtrait sinon.
+    st.html : pas de passage par le moteur markdown pour ce bloc statique.
+    """
+    st.html(_GLOBAL_CSS)
+
+
+def card():
+    """
+    Carte : conteneur Streamlit natif à bordure, à utiliser en `with`
+    (aussi depuis app.py). Le contenu est réellement à l'intérieur du bloc,
+    sans injection HTML.
+    """
+    return st.container(border=True)
 
 
 # ----------------------------------------------------------------------
@@ -43,33 +50,32 @@ def render_address_step() -> bool:
     Étape adresse : l'utilisateur saisit l'adresse.
     Le geocoding est géré dans app.py, ici on stocke juste l'adresse.
     """
-    st.markdown('<div class="lc-card">', unsafe_allow_html=True)
-    st.subheader("Adresse du chantier")
+    with card():
+        st.subheader("Adresse du chantier")
 
-    addr = st.text_input(
-        "Adresse",
-        value=st.session_state.get("addr_label", "") or "",
-        placeholder="Ex. : 15 rue Brézin, 75014 Paris",
-    )
+        addr = st.text_input(
+            "Adresse",
+            value=st.session_state.get("addr_label", "") or "",
+            placeholder="Ex. : 15 rue Brézin, 75014 Paris",
+        )
 
-    st.markdown(
-        "<p style='font-size:0.9rem;color:#555;'>"
-        "Saisissez l'adresse du bâtiment à ravaler. "
-        "Vous préciserez les dimensions et l'état de la façade aux étapes suivantes."
-        "</p>",
-        unsafe_allow_html=True,
-    )
+        st.markdown(
+            "<p style='font-size:0.9rem;color:#555;'>"
+            "Saisissez l'adresse du bâtiment à ravaler. "
+            "Vous préciserez les dimensions et l'état de la façade aux étapes suivantes."
+            "</p>",
+            unsafe_allow_html=True,
+        )
 
-    ok = False
-    if st.button("Valider l'adresse et continuer", type="primary"):
-        addr = (addr or "").strip()
-        if not addr:
-            st.error("Merci de renseigner une adresse.")
-        else:
-            st.session_state.addr_label = addr
-            ok = True
+        ok = False
+        if st.button("Valider l'adresse et continuer", type="primary"):
+            addr = (addr or "").strip()
+            if not addr:
+                st.error("Merci de renseigner une adresse.")
+            else:
+                st.session_state.addr_label = addr
+                ok = True
 
-    st.markdown("</div>", unsafe_allow_html=True)
     return ok
 
 
@@ -85,6 +91,8 @@ def render_map_and_form(
     """
     Affiche la Street View à gauche et le formulaire à droite.
     Sur mobile, les colonnes s'empilent.
+    L'URL Street View est calculée une seule fois à l'étape 0
+    (st.session_state.streetview_url).
     """
     coords = st.session_state.get("coords")
 
@@ -92,29 +100,27 @@ def render_map_and_form(
 
     # Colonne gauche : façade (Street View)
     with col_map:
-        st.markdown('<div class="lc-card">', unsafe_allow_html=True)
-        st.markdown("**Votre façade**", unsafe_allow_html=True)
-
-        if coords and google_api_key:
-            iframe_url = build_streetview_embed_url(coords["lat"], coords["lon"], google_api_key)
-            if iframe_url:
-                st.markdown(
-                    f'<iframe src="{iframe_url}" width="100%" height="320" '
-                    f'style="border:0;border-radius:14px;" '
-                    f'allowfullscreen loading="lazy"></iframe>',
-                    unsafe_allow_html=True,
-                )
+        with card():
+            st.markdown("**Votre façade**", unsafe_allow_html=True)
+
+            if coords and google_api_key:
+                iframe_url = st.session_state.get("streetview_url")
+                if iframe_url:
+                    st.markdown(
+                        f'<iframe src="{iframe_url}" width="100%" height="320" '
+                        f'style="border:0;border-radius:14px;" '
+                        f'allowfullscreen loading="lazy"></iframe>',
+                        unsafe_allow_html=True,
+                    )
+                else:
+                    st.info("Street View n'est pas disponible pour cette adresse.")
             else:
-                st.info("Street View n'est pas disponible pour cette adresse.")
-        else:
-            st.info("La vue Street View apparaîtra ici après la géolocalisation de l'adresse.")
-        st.markdown("</div>", unsafe_allow_html=True)
+                st.info("La vue Street View apparaîtra ici après la géolocalisation de l'adresse.")
 
     # Colonne droite : formulaire
     with col_form:
-        st.markdown('<div class="lc-card">', unsafe_allow_html=True)
-        out = form_func(osm_ctx or {}, **form_kwargs)
-        st.markdown("</div>", unsafe_allow_html=True)
+        with card():
+            out = form_func(osm_ctx or {}, **form_kwargs)
 
     return out
 
@@ -343,13 +349,12 @@ def render_price_banner(total_ttc: Optional[float], label: str) -> None:
     if total_ttc is None:
         return
 
-    txt = f"{total_ttc:,.0f} € TTC".replace(",", " ").replace(".", ",")
-    st.markdown(
+    txt = fmt_eur(total_ttc)
+    st.html(
         f"""
         <div class="lc-bandeau-prix">
             <div><b>{label}</b> : {txt}</div>
             <small>Montant indicatif à confirmer après visite sur place.</small>
         </div>
-        """,
-        unsafe_allow_html=True,
+        """
     )